@@ -7,9 +7,13 @@ _hard_dependencies=[
     'pyarrow',
 ]
 
-# _soft_dependencies=[
-#     'pyarrow',
-# ]
+# optional packages, used for faster paths when installed
+_soft_dependencies=[
+    'aioboto3',
+    'isal',
+    'awscrt',
+    'orjson',
+]
 
 _missing_dependencies = []
 for _dependency in _hard_dependencies:
@@ -31,5 +35,5 @@ __all__ = [
     "s3namic",
 ]
 
-del _hard_dependencies, _dependency, _missing_dependencies
+del _hard_dependencies, _soft_dependencies, _dependency, _missing_dependencies
 
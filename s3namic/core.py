@@ -1,18 +1,109 @@
 from boto3 import client
 from botocore import config
+from botocore.exceptions import ClientError
 import csv
+import codecs
 import pandas as pd
 import json
 import pickle
-import gzip
 import bz2
 import io
+import os
+import shutil
+import tempfile
+import threading
+import asyncio
 from PIL import Image
 
+try:
+    from isal import igzip as gzip  # ISA-L accelerated drop-in for gzip (about 2x faster)
+except ImportError:
+    import gzip
+
+try:
+    import aioboto3
+except ImportError:  # optional: enables the asyncio fetch path of read_thread
+    aioboto3 = None
+
+try:
+    import orjson  # json parser working on utf-8 bytes directly
+except ImportError:
+    orjson = None
+
+try:
+    import awscrt
+except ImportError:  # optional: enables the CRT fetch path of read_thread (use_crt=True)
+    awscrt = None
+
+# number of get_object requests kept in flight by read_thread
+DEFAULT_CONCURRENCY = min(64, (os.cpu_count() or 1) * 8)
+# chunk size used when streaming compressed bodies into the decompressor
+READ_BUFFER_SIZE = 128 * 1024
+# bodies larger than this are uploaded in parallel parts instead of a single put_object
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+# compress/decompress keep up to this much in memory before spilling to a temporary file
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+# compression methods: {name: (file extension, compress function, stream opener(fileobj, mode))}
+COMPRESSIONS = {
+    "gzip": (
+        "gz",
+        gzip.compress,
+        lambda fileobj, mode: gzip.GzipFile(fileobj=fileobj, mode=mode),
+    ),
+    "bz2": (
+        "bz2",
+        bz2.compress,
+        lambda fileobj, mode: bz2.BZ2File(fileobj, mode=mode),
+    ),
+}
+# file extensions of compressed files: {file extension: compression method}
+COMPRESSED_EXTENSIONS = {
+    extension: compression for compression, (extension, _, _) in COMPRESSIONS.items()
+}
+# extensions supported by read_auto and the read method handling each of them
+READ_METHODS = {
+    "csv": "read_csv",
+    "json": "read_json",
+    "txt": "read_txt",
+    "sql": "read_txt",
+    "pkl": "read_pkl",
+    "parquet": "read_parquet",
+}
+
+
+def _compression(file_name: str) -> str:
+    """compression method of a file from its extension (None if not compressed)"""
+    _, dot, extension = file_name.rpartition(".")
+    return COMPRESSED_EXTENSIONS.get(extension) if dot else None
+
+
+def _event_loop_running() -> bool:
+    """whether an asyncio event loop is running in this thread"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _is_utf8(encoding: str) -> bool:
+    """whether encoding is an alias of utf-8 (e.g. 'UTF8', 'utf_8')"""
+    return codecs.lookup(encoding).name == "utf-8"
+
+
 class s3namic:
     """
     module for accessing s3 bucket and performing various tasks
 
+    Args:
+        bucket (str): bucket name
+        access_key (str): aws access key id
+        secret_key (str): aws secret access key
+        region (str): region name
+        max_pool_connections (int): size of the connection pool of the boto3 client (default: 64)
+            - Keep it at least as large as the number of threads used (workers, concurrency)
+        use_crt (bool): download files of read_thread with the AWS CRT S3 client, if awscrt is installed (default: False)
+
     Example:
         >>> s3 = s3namic(bucket, access_key, secret_key, region)
     """
@@ -22,20 +113,74 @@ class s3namic:
         access_key: str,
         secret_key: str, 
         region: str,
+        max_pool_connections: int = 64,
+        use_crt: bool = False,
     ): 
         self.__bucket = bucket
-        self.__s3 = client(
-            service_name="s3",
+        self.__credentials = dict(
             aws_access_key_id=access_key,
             aws_secret_access_key=secret_key,
             region_name=region,
+        )
+        self.__s3 = client(
+            service_name="s3",
+            **self.__credentials,
             config=config.Config(
                 read_timeout=60 * 60,  # an hour
                 connect_timeout=60 * 60,  # an hour
                 retries={"max_attempts": 0},
+                max_pool_connections=max_pool_connections,  # avoid "Connection pool is full" under threads
+                tcp_keepalive=True,
             ),
         )
         self.paginator = self.__s3.get_paginator("list_objects_v2")
+        self.__max_pool_connections = max_pool_connections
+        self.__pool_size = min(max_pool_connections, max(32, (os.cpu_count() or 4) * 8))
+        self.__pool = None  # thread pool shared by _thread_map, created on first use
+        self.__use_crt = use_crt and awscrt is not None
+        self.__crt_manager = None  # CRTTransferManager of read_thread, created on first use
+        self.__arrow_fs = None  # pyarrow S3FileSystem of read_parquet, created on first use
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        pool = getattr(self, "_s3namic__pool", None)  # __init__ may not have finished
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def close(self):
+        """
+        Shut down the thread pool used by _thread_map and the CRT client (they are created again if needed)
+
+        Example:
+            >>> with s3namic(bucket, access_key, secret_key, region) as s3:
+            ...     s3.read_thread(prefix='assets/csv/')
+        """
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+        if self.__crt_manager is not None:
+            self.__crt_manager.shutdown()
+            self.__crt_manager = None
+
+    @property
+    def _pool(self):
+        """
+        ThreadPoolExecutor kept for the lifetime of the instance
+        max(32, os.cpu_count() * 8) threads, but no more than the connection pool of the client
+        """
+        if self.__pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self.__pool = ThreadPoolExecutor(
+                max_workers=self.__pool_size,
+                thread_name_prefix="s3namic",
+            )
+        return self.__pool
 
     def _write_file(
         self,
@@ -48,6 +193,7 @@ class s3namic:
         Write files to s3 bucket
         Write files to s3 bucket
         s3.upload_file() reads the file and uploads it to memory, and s3.put_object() writes the file directly without reading it, so memory usage is small.
+        Bodies larger than MULTIPART_THRESHOLD (8MB) are uploaded as a multipart upload with parallel parts.
         Use s3.upload_file() to upload a local file to your s3 bucket, and use s3.put_object (corresponding method) to directly write the contents of a file in your code.
 
         Args:
@@ -65,50 +211,182 @@ class s3namic:
             if isinstance(file_content, str)
             else file_content
         )
-        if compression == "gzip":
-            file_content = gzip.compress(file_content)
+        if compression in COMPRESSIONS:
+            extension, compress, _ = COMPRESSIONS[compression]
+            file_content = compress(file_content)
             file_name = (
-                f"{file_name}.gz" if not file_name.endswith(".gz") else file_name
+                f"{file_name}.{extension}"
+                if not file_name.endswith(f".{extension}")
+                else file_name
             )
-        elif compression == "bz2":
-            file_content = bz2.compress(file_content)
-            file_name = (
-                f"{file_name}.bz2" if not file_name.endswith(".bz2") else file_name
+
+        if len(file_content) > MULTIPART_THRESHOLD:
+            self._upload_fileobj(io.BytesIO(file_content), file_name)
+        else:
+            self.__s3.put_object(
+                Bucket=self.__bucket,
+                Key=file_name,
+                Body=file_content,
             )
 
-        self.__s3.put_object(
-            Bucket=self.__bucket,
-            Key=file_name,
-            Body=file_content,
+    def _upload_fileobj(self, file_obj, file_name: str):
+        """
+        Upload file object to s3 bucket in parts of MULTIPART_THRESHOLD bytes, uploaded by parallel threads
+
+        Args:
+            file_obj (file-like object): file content
+            file_name (str): file name (including path)
+        """
+        from boto3.s3.transfer import TransferConfig
+
+        self.__s3.upload_fileobj(
+            file_obj,
+            self.__bucket,
+            file_name,
+            Config=TransferConfig(
+                multipart_threshold=MULTIPART_THRESHOLD,
+                multipart_chunksize=MULTIPART_THRESHOLD,
+                max_concurrency=16,
+                use_threads=True,
+            ),
         )
 
-    def _read_file(self, file_name: str):
+    def _open_file(self, file_name: str, body: bytes = None):
+        """
+        Open files from s3 bucket as a stream
+        Compressed files are decompressed while the body is read, so the whole compressed body is never held in memory
+
+        Args:
+            file_name (str): file name (including path)
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
+
+        Returns:
+            file-like object: (decompressed) file content
+        """
+        if body is not None:
+            stream = io.BytesIO(body)
+        else:
+            obj = self.__s3.get_object(
+                Bucket=self.__bucket,
+                Key=file_name,
+            )
+            stream = io.BufferedReader(obj["Body"], buffer_size=READ_BUFFER_SIZE)
+        # decompress the stream depending on whether the file is compressed
+        compression = _compression(file_name)
+        return COMPRESSIONS[compression][2](stream, "rb") if compression else stream
+
+    def _read_file(self, file_name: str, body: bytes = None) -> bytes:
         """
         Read files from s3 bucket
 
         Args:
             file_name (str): file name (including path)
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
+
+        Returns:
+            bytes: (decompressed) file content
         """
-        compress = (
-            "gzip"
-            if file_name.endswith(".gz")
-            else "bz2"
-            if file_name.endswith(".bz2")
-            else None
-        )
+        with self._open_file(file_name, body) as stream:
+            return stream.read()
 
-        self.__obj = self.__s3.get_object(
-            Bucket=self.__bucket,
-            Key=file_name,
-        )
-        # read file contents depending on whether the file is compressed
-        self.read_content = (
-            gzip.decompress(self.__obj["Body"].read())
-            if compress == "gzip"
-            else bz2.decompress(self.__obj["Body"].read())
-            if compress == "bz2"
-            else self.__obj["Body"].read()
-        )
+    async def _fetch_async(self, batches: list, concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Download files from s3 bucket concurrently (using aioboto3)
+        A single client is shared by every batch, and the get_object requests of a batch are issued together with asyncio.gather
+
+        Args:
+            batches (list): lists of file names (including path), one list per batch
+            concurrency (int): size of the connection pool of the client (default: DEFAULT_CONCURRENCY)
+
+        Yields:
+            dict: {file name: raw body (not decompressed)} of each batch
+        """
+        from aiobotocore.config import AioConfig
+
+        session = aioboto3.Session(**self.__credentials)
+        async with session.client(
+            "s3", config=AioConfig(max_pool_connections=concurrency)
+        ) as s3:
+
+            async def _get_file(file_name):
+                obj = await s3.get_object(Bucket=self.__bucket, Key=file_name)
+                async with obj["Body"] as stream:
+                    return file_name, await stream.read()
+
+            for batch in batches:
+                yield dict(await asyncio.gather(*(_get_file(file) for file in batch)))
+
+    def _fetch_batches(self, batches: list, concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Download files from s3 bucket batch by batch, with the CRT client (use_crt=True) or else with aioboto3 (using _fetch_crt, _fetch_async)
+        The next batch is downloaded only when it is requested, so only one batch is held in memory
+
+        Args:
+            batches (list): lists of file names (including path), one list per batch
+            concurrency (int): size of the connection pool of the aioboto3 client (default: DEFAULT_CONCURRENCY)
+
+        Yields:
+            dict: {file name: raw body (not decompressed)} of each batch
+        """
+        if self.__use_crt:
+            for batch in batches:
+                yield self._fetch_crt(batch)
+            return
+
+        loop = asyncio.new_event_loop()
+        fetched = self._fetch_async(batches, concurrency)
+        try:
+            while True:
+                try:
+                    bodies = loop.run_until_complete(fetched.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield bodies
+        finally:
+            loop.run_until_complete(fetched.aclose())  # close the client
+            loop.close()
+
+    def _fetch_crt(self, files: list) -> dict:
+        """
+        Download files from s3 bucket with the AWS CRT S3 client
+        The CRT splits the objects into ranged GETs over its own native thread pool, which saturates the network better than python threads
+
+        Args:
+            files (list): file names (including path)
+
+        Returns:
+            dict: {file name: raw body (not decompressed)}
+        """
+        if self.__crt_manager is None:
+            from awscrt.auth import AwsCredentialsProvider
+            from botocore.session import Session
+            from s3transfer.crt import (
+                BotocoreCRTRequestSerializer,
+                CRTTransferManager,
+                create_s3_crt_client,
+            )
+
+            self.__crt_manager = CRTTransferManager(
+                create_s3_crt_client(
+                    region=self.__credentials["region_name"],
+                    crt_credentials_provider=AwsCredentialsProvider.new_static(
+                        self.__credentials["aws_access_key_id"],
+                        self.__credentials["aws_secret_access_key"],
+                    ),
+                ),
+                BotocoreCRTRequestSerializer(
+                    Session(), {"region_name": self.__credentials["region_name"]}
+                ),
+            )
+
+        buffers = {file: io.BytesIO() for file in files}
+        futures = [
+            self.__crt_manager.download(self.__bucket, file, buffer)
+            for file, buffer in buffers.items()
+        ]
+        for future in futures:
+            future.result()  # raise the first failed download
+        return {file: buffer.getvalue() for file, buffer in buffers.items()}
 
     def read_image(self, file_name: str, to_image: bool = False):
         """
@@ -126,23 +404,23 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.read_image('test.png')
         """
-        self._read_file(file_name)
-        file_stream = io.BytesIO(self.read_content)
+        file_stream = io.BytesIO(self._read_file(file_name))
         if not to_image:
             return file_stream
         else:
             return Image.open(file_stream)
 
-    def _thread_map(self, func, iterable: list, max_workers: int = 4) -> list:
+    def _thread_map(self, func, iterable: list, max_workers: int = None) -> list:
         """
         쓰레드를 사용하여 함수를 병렬로 실행하는 함수
 
         Args:
             func (function): function
             iterable (list): Iterable object
-            workers (int): number of threads (default: 4)
-                - If the workers parameter is not used, set the number of threads to 4
-                - It is recommended to set the thread count automatically using os.cpu_count()
+            max_workers (int): number of threads (default: None)
+                - If None, the thread pool of the instance (_pool) is reused instead of starting new threads
+                - If set, a thread pool of that size is created for this call only
+                - Called from a thread of _pool (nested), a thread pool is created for this call only, as waiting on _pool from its own thread can deadlock
 
         Returns:
             list: result
@@ -151,6 +429,11 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3._thread_map(lambda x: x, [1, 2, 3])
         """
+        if max_workers is None:
+            if not threading.current_thread().name.startswith("s3namic"):
+                return list(self._pool.map(func, iterable))
+            max_workers = self.__pool_size
+
         from concurrent.futures import ThreadPoolExecutor
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -180,8 +463,40 @@ class s3namic:
         Example:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.delete_file('test.txt')
+
+        Raises:
+            botocore.exceptions.ClientError: if the file could not be deleted (e.g. AccessDenied)
+        """
+        errors = self.delete_files([file_name])
+        if errors:
+            raise ClientError({"Error": errors[0]}, "DeleteObjects")
+
+    def delete_files(self, file_names: list) -> list:
         """
-        self.__s3.delete_object(Bucket=self.__bucket, Key=file_name)
+        Delete files from s3 bucket, up to 1000 files per request (using s3.delete_objects())
+
+        Args:
+            file_names (list): file names (including path)
+
+        Returns:
+            list: files that could not be deleted ({'Key', 'Code', 'Message'} for each file)
+
+        Example:
+            >>> s3 = s3namic(bucket, access_key, secret_key, region)
+            >>> s3.delete_files(s3.list_files(prefix='assets/test/'))
+        """
+        errors = []
+        for start in range(0, len(file_names), 1000):  # max number of keys of delete_objects
+            response = self.__s3.delete_objects(
+                Bucket=self.__bucket,
+                Delete={
+                    "Objects": [{"Key": file} for file in file_names[start : start + 1000]],
+                    "Quiet": True,  # report only the failed keys
+                },
+            )
+            errors.extend(response.get("Errors", []))
+
+        return errors
 
     def download_file(self, file_name: str, load_path: str):
         """
@@ -197,9 +512,31 @@ class s3namic:
         """
         self.__s3.download_file(self.__bucket, file_name, load_path)
 
+    def _stream_to_s3(self, stream, file_name: str, compression: str = None):
+        """
+        Copy a stream into a file in s3 bucket chunk by chunk, compressing it on the way if requested
+        The output is spooled in memory up to SPOOL_MAX_SIZE (64MB) and in a temporary file beyond that
+
+        Args:
+            stream (file-like object): source content
+            file_name (str): file name (including path)
+            compression (str): compression method (gzip, bz2) (default: None)
+        """
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+            target = (
+                COMPRESSIONS[compression][2](buffer, "wb")
+                if compression in COMPRESSIONS
+                else buffer
+            )
+            shutil.copyfileobj(stream, target, 1024 * 1024)
+            if target is not buffer:
+                target.close()  # flush the compressor, buffer stays open
+            buffer.seek(0)
+            self._upload_fileobj(buffer, file_name)
+
     def compress(self, file_name: str, compression: str = "gzip"):
         """
-        Compress files in s3 bucket and save them as files (using _read_file() method, _write_file() method)
+        Compress files in s3 bucket and save them as files (streamed using _open_file() method, _stream_to_s3() method)
 
         Args:
             file_name (str): file name (including path)
@@ -209,22 +546,21 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3._comp_gzip(file_name='test.txt')
         """
-        self._read_file(file_name)
-        self._write_file(
-            file_name=f"{file_name}.gz", file_content=gzip.compress(self.read_content)
-        ) if compression == "gzip" else self._write_file(
-            file_name=f"{file_name}.bz2", file_content=bz2.compress(self.read_content)
-        ) if compression == "bz2" else print(
-            "Please enter the exact compression method."
-        )
+        if compression not in COMPRESSIONS:
+            print("Please enter the exact compression method.")
+            return
+
+        compressed_name = f"{file_name}.{COMPRESSIONS[compression][0]}"
+        with self._open_file(file_name) as stream:
+            self._stream_to_s3(stream, file_name=compressed_name, compression=compression)
 
         print(
-            f'The file {file_name} was compressed using {compression} and saved as {file_name}.{"gz" if compression == "gzip" else "bz2"}.'
+            f"The file {file_name} was compressed using {compression} and saved as {compressed_name}."
         )
 
     def decompress(self, file_name: str):
         """
-        Unzip the file in the s3 bucket and save it as a file (using the _read_file() method, _write_file() method)
+        Unzip the file in the s3 bucket and save it as a file (streamed using _open_file() method, _stream_to_s3() method)
 
         Args:
             file_name (str): file name (including path)
@@ -233,14 +569,14 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.decompress(file_name='test.txt.gz')
         """
-        self._read_file(file_name)
-        self._write_file(
-            file_name=file_name.replace(".gz", "").replace(".bz2", ""),
-            file_content=self.read_content,
+        decompressed_name = (
+            file_name.rpartition(".")[0] if _compression(file_name) else file_name
         )
+        with self._open_file(file_name) as stream:
+            self._stream_to_s3(stream, file_name=decompressed_name)
 
         print(
-            f'The file {file_name} was unzipped and saved as {file_name.replace(".gz", "").replace(".bz2", "")}.'
+            f"The file {file_name} was unzipped and saved as {decompressed_name}."
         )
 
     def get_file_url(self, file_name: str, expires_in: int = 3600) -> str:
@@ -270,6 +606,7 @@ class s3namic:
         encoding: str = "utf-8",
         sep: str = ",",
         data_frame: bool = True,
+        body: bytes = None,
         **kwargs,
     ):
         """
@@ -280,26 +617,37 @@ class s3namic:
             encoding (str): encoding (default: utf-8)
             sep (str): separator (default: ,)
             data_frame (bool): return type (default: True)
-            **kwargs: arguments for pd.DataFrame
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
+            **kwargs: arguments for pd.read_csv (only used if data_frame is True)
                 document: https://pd.pydata.org/pandas-docs/stable/reference/api/pd.read_csv.html
+                - usecols: read only these columns, the others are skipped while parsing
+                - dtype: column types, skips the type inference of pandas
+                - chunksize: return an iterator of DataFrames of chunksize rows instead of one DataFrame
+                - engine: parser of pandas (default: 'c'), engine='pyarrow' parses in multiple threads but supports fewer options
 
         Returns:
             pd.DataFrame: csv file
+            pd.io.parsers.TextFileReader: iterator of DataFrames (if chunksize or iterator is given)
+            list: rows of csv file (if data_frame is False)
 
         Example:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
-            >>> s3.read_csv(file_name='test.csv', encoding='utf-8', **kwargs)
+            >>> s3.read_csv(file_name='test.csv', encoding='utf-8', usecols=['id', 'name'], dtype={'id': 'int64'})
         """
-        self._read_file(file_name=file_name)
-        splits = list(
-            csv.reader(self.read_content.decode(encoding).splitlines(), delimiter=sep)
-        )
-
-        return (
-            splits
-            if not data_frame
-            else pd.DataFrame(splits[1:], columns=splits[0], **kwargs)
-        )
+        # parse the (decompressed) body while it is read, without holding it all as bytes first
+        stream = self._open_file(file_name=file_name, body=body)
+        if not data_frame:
+            with io.TextIOWrapper(stream, encoding=encoding, newline="") as text:
+                return list(csv.reader(text, delimiter=sep))
+
+        try:
+            result = pd.read_csv(stream, sep=sep, encoding=encoding, **kwargs)
+        except BaseException:  # release the connection of the stream
+            stream.close()
+            raise
+        if isinstance(result, pd.DataFrame):  # chunksize/iterator keep reading the stream lazily
+            stream.close()
+        return result
 
     def read_excel(
         self, file_name: str, encoding: str = "utf-8", **kwargs
@@ -320,19 +668,21 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.read_excel(file_name='test.xlsx', sheet_name=0, header=0, names=None, **kwargs)
         """
-        self._read_file(file_name=file_name)
-
-        return pd.read_excel(io.BytesIO(self.read_content), **kwargs)
+        return pd.read_excel(io.BytesIO(self._read_file(file_name=file_name)), **kwargs)
 
-    def read_json(self, file_name: str, encoding: str = "utf-8", **kwargs) -> dict:
+    def read_json(
+        self, file_name: str, encoding: str = "utf-8", body: bytes = None, **kwargs
+    ) -> dict:
         """
         Read json file from s3 bucket
 
         Args:
             file_name (str): file name (including path)
             encoding (str): encoding (default: utf-8)
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
             **kwargs: arguments for json.loads
                 document: https://docs.python.org/ko/3/library/json.html
+                - If orjson is installed and neither kwargs nor an encoding other than utf-8 is given, orjson.loads is tried first
 
         Returns:
             dict: json file
@@ -341,16 +691,24 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3._read_json(file_name='test.json', encoding='utf-8')
         """
-        self._read_file(file_name)
-        return json.loads(self.read_content.decode(encoding), **kwargs)
-
-    def read_txt(self, file_name: str, encoding: str = "utf-8") -> str:
+        content = self._read_file(file_name, body)
+        if orjson is not None and not kwargs and _is_utf8(encoding):
+            try:
+                return orjson.loads(content)  # parses the bytes without decoding them first
+            except orjson.JSONDecodeError:  # e.g. NaN or Infinity, which json.loads accepts
+                pass
+        return json.loads(content.decode(encoding), **kwargs)
+
+    def read_txt(
+        self, file_name: str, encoding: str = "utf-8", body: bytes = None
+    ) -> str:
         """
         Read txt file from s3 bucket
 
         Args:
             file_name (str): file name (including path)
             encoding (str): encoding (default: utf-8)
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
 
         Returns:
             str: txt file
@@ -359,19 +717,20 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3._read_txt(file_name='test.txt', encoding='utf-8')
         """
-        self._read_file(file_name)
-        return self.read_content.decode(encoding)
+        return self._read_file(file_name, body).decode(encoding)
 
     def read_pkl(
-        self, file_name: str, encoding: str = "utf-8", **kwargs
+        self, file_name: str, encoding: str = None, body: bytes = None, **kwargs
     ) -> pd.DataFrame:
         """
         Read pickle file from s3 bucket
 
         Args:
             file_name (str): file name (including path)
-            encoding (str): encoding (default: utf-8)
-            **kwargs: arguments for pickle.load
+            encoding (str): encoding of str objects pickled by python 2, passed to pickle.loads (default: None)
+                - pickle is a binary format, so the file content itself is not decoded
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
+            **kwargs: arguments for pickle.loads
                 document: https://docs.python.org/ko/3/library/pickle.html
 
         Returns:
@@ -379,20 +738,27 @@ class s3namic:
 
         Example:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
-            >>> s3._read_pkl(file_name='test.pickle', encoding='utf-8')
+            >>> s3._read_pkl(file_name='test.pickle')
         """
-        self._read_file(file_name)
-        return pickle.loads(self.read_content.decode(encoding), **kwargs)
+        if encoding is not None:
+            kwargs["encoding"] = encoding
 
-    def read_parquet(self, file_name: str, **kwargs) -> pd.DataFrame:
+        return pickle.loads(self._read_file(file_name, body), **kwargs)
+
+    def read_parquet(self, file_name: str, body: bytes = None, **kwargs) -> pd.DataFrame:
         """
         Read parquet file from s3 bucket
+        pyarrow reads the file from s3 directly (pyarrow.fs.S3FileSystem), so only the byte ranges of the selected columns and row groups are downloaded
+        Compressed files (gz, bz2) are downloaded and read from memory
 
         Args:
             file_name (str): file name (including path)
             encoding (str): encoding (default: utf-8)
+            body (bytes): raw body already downloaded (e.g. by read_thread), skips get_object (default: None)
             **kwargs: arguments for pd.read_parquet
                 document: https://pd.pydata.org/pandas-docs/stable/reference/api/pd.read_parquet.html
+                - columns: read only these columns
+                - filters: skip the row groups that do not match, e.g. [('year', '=', 2023)]
 
         Returns:
             pd.DataFrame: parquet file
@@ -410,8 +776,21 @@ class s3namic:
         if "encoding" in kwargs:
             kwargs.pop("encoding")
 
-        self._read_file(file_name)
-        return pd.read_parquet(BufferReader(self.read_content), **kwargs)
+        # compressed files and bodies already downloaded are parsed from memory
+        if _compression(file_name) or body is not None:
+            return pd.read_parquet(BufferReader(self._read_file(file_name, body)), **kwargs)
+
+        if self.__arrow_fs is None:
+            from pyarrow import fs
+
+            self.__arrow_fs = fs.S3FileSystem(
+                access_key=self.__credentials["aws_access_key_id"],
+                secret_key=self.__credentials["aws_secret_access_key"],
+                region=self.__credentials["region_name"],
+            )
+        return pd.read_parquet(
+            f"{self.__bucket}/{file_name}", filesystem=self.__arrow_fs, **kwargs
+        )
 
     def extension(self, file_name: str) -> str:
         """
@@ -427,11 +806,10 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.extension(file_name='test.txt')
         """
-        return (
-            file_name.split(".")[-2]
-            if (file_name.split(".")[-1] == "gz" or file_name.split(".")[-1] == "bz2")
-            else file_name.split(".")[-1]
-        )
+        head, _, extension = file_name.rpartition(".")
+        if extension in COMPRESSED_EXTENSIONS:  # extension of the compressed file
+            extension = head.rpartition(".")[2]
+        return extension
 
     def write_csv(
         self,
@@ -456,11 +834,11 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.write_csv(file_name='test.csv', df=df, encoding='utf-8', index=False)
         """
-        file_content = (
-            file_content.to_csv(encoding=encoding, **kwargs)
-            if isinstance(file_content, pd.DataFrame)
-            else file_content
-        )
+        if isinstance(file_content, pd.DataFrame):
+            # write encoded bytes directly instead of building the whole csv as str first
+            buffer = io.BytesIO()
+            file_content.to_csv(buffer, encoding=encoding, **kwargs)
+            file_content = buffer.getvalue()
 
         self._write_file(
             file_name=file_name,
@@ -492,21 +870,15 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.write_json(file_name='test.json', df=df, encoding='utf-8', force_ascii=False, orient='records', indent=4)
         """
-        file_content = (
-            file_content.to_json(**kwargs)
-            if isinstance(file_content, pd.DataFrame)
-            else file_content
-        )
-        file_content = (
-            json.dumps(file_content, ensure_ascii=False)
-            if isinstance(file_content, dict)
-            else file_content
-        )
-        file_content = (
-            json.dumps(file_content, ensure_ascii=False)
-            if isinstance(file_content, list)
-            else file_content
-        )
+        if isinstance(file_content, pd.DataFrame):
+            if _is_utf8(encoding):  # to_json writes utf-8 to binary buffers
+                buffer = io.BytesIO()
+                file_content.to_json(buffer, **kwargs)
+                file_content = buffer.getvalue()
+            else:
+                file_content = file_content.to_json(**kwargs)
+        elif isinstance(file_content, (dict, list)):
+            file_content = json.dumps(file_content, ensure_ascii=False)
 
         self._write_file(
             file_name=file_name,
@@ -601,16 +973,10 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.write_parquet(file_name='test.parquet', file_content=df, encoding='utf-8', index=False)
         """
-        file_content = (
-            file_content.to_parquet(**kwargs)
-            if isinstance(file_content, pd.DataFrame)
-            else file_content
-        )
-        file_content = (
-            file_content.to_parquet(**kwargs)
-            if isinstance(file_content, pd.Series)
-            else file_content
-        )
+        if isinstance(file_content, pd.DataFrame):
+            file_content = file_content.to_parquet(**kwargs)
+        elif isinstance(file_content, pd.Series):  # pd.Series has no to_parquet
+            file_content = file_content.to_frame().to_parquet(**kwargs)
         assert isinstance(file_content, bytes), "file_content must be bytes"
 
         self._write_file(
@@ -621,15 +987,22 @@ class s3namic:
         )
 
     def make_tree(
-        self, prefix: str = "", delimiter: str = "/", with_file_name: bool = False
+        self,
+        prefix: str = "",
+        delimiter: str = "/",
+        with_file_name: bool = False,
+        workers: int = 16,
     ) -> dict:
         """
-        make tree of file path in s3 bucket(recursive)
+        make tree of file path in s3 bucket
+        Sub directories are listed in parallel threads (breadth first), then the tree is built from the listings
 
         Args:
             prefix (str): file path prefix (default: '')
             delimiter (str): file path delimiter (default: '/')
             with_file_name (bool): include file name in tree (default: False)
+            workers (int): number of threads listing sub directories (default: 16)
+                - No more than max_pool_connections threads are used
 
         Returns:
             dict: tree of file path in s3 bucket
@@ -638,25 +1011,52 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.make_tree()
         """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        listings = {}  # {prefix: (files, sub directories)}
+        with ThreadPoolExecutor(
+            max_workers=min(workers, self.__max_pool_connections)
+        ) as executor:
+            pending = {executor.submit(self._list_level, prefix, delimiter): prefix}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, folders = listings[pending.pop(future)] = future.result()
+                    for folder in folders:
+                        pending[executor.submit(self._list_level, folder, delimiter)] = folder
+
+        def build(prefix):
+            files, folders = listings[prefix]
+            tree = {folder: build(folder) for folder in folders}
+            if with_file_name:
+                tree.update(dict.fromkeys(files))
+            return tree
+
+        return build(prefix)
 
+    def _list_level(self, prefix: str = "", delimiter: str = "/") -> tuple:
+        """
+        list one level of s3 bucket in a single pass of the paginator
+
+        Args:
+            prefix (str): file path prefix (default: '')
+            delimiter (str): file path delimiter (default: '/')
+
+        Returns:
+            tuple: (list of files, list of sub directories)
+        """
         response_iterator = self.paginator.paginate(
             Bucket=self.__bucket, Prefix=prefix, Delimiter=delimiter
         )
 
-        tree = {}
+        files, folders = [], []
         for response in response_iterator:
-            if "CommonPrefixes" in response: # if response has CommonPrefixes, it means it has sub directory
-                for file in response["CommonPrefixes"]: 
-                    tree[file["Prefix"]] = self.make_tree(
-                        file["Prefix"], delimiter, with_file_name
-                    )
-
-            if with_file_name:
-                if "Contents" in response:
-                    for file in response["Contents"]:
-                        tree[file["Key"]] = None
+            if "Contents" in response:
+                files.extend(file["Key"] for file in response["Contents"])
+            if "CommonPrefixes" in response:  # if response has CommonPrefixes, it means it has sub directory
+                folders.extend(folder["Prefix"] for folder in response["CommonPrefixes"])
 
-        return tree
+        return files, folders
 
     def list_files(self, prefix: str = "", delimiter: str = "") -> list:
         """
@@ -692,7 +1092,7 @@ class s3namic:
         str_contains: bool = True,
     ) -> str:
         """
-        find file in s3 bucket(recursive)
+        find file in s3 bucket(breadth first, from the top folder down)
 
         Args:
             file_name (str): file name
@@ -706,38 +1106,29 @@ class s3namic:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.find_file('test.txt')
         """
-        response_iterator = self.paginator.paginate(
-            Bucket=self.__bucket, Prefix=prefix, Delimiter=delimiter
-        )
-
-        for response in response_iterator:
-            if "Contents" in response:  # if response has CommonPrefixes, it means it has sub directory
-                for file in response["Contents"]:
-                    if str_contains:  # if file_name is substring of file path
-                        if file_name in file["Key"]:
-                            return file["Key"]
-                    else:
-                        if file_name == file["Key"]:
-                            return file["Key"]
-
-        for response in response_iterator:
-            if "CommonPrefixes" in response:  # if folder exists
-                for prefix in response["CommonPrefixes"]: 
-                    file_path = self.find_file(
-                        file_name, prefix["Prefix"], delimiter, str_contains
-                    )  # recursive
-                    if file_path is not None:
-                        return file_path
+        from collections import deque
+
+        prefixes = deque([prefix])  # folders to scan, breadth first
+        while prefixes:
+            files, folders = self._list_level(prefixes.popleft(), delimiter)
+            for file in files:
+                if str_contains:  # if file_name is substring of file path
+                    if file_name in file:
+                        return file
+                else:
+                    if file_name == file:
+                        return file
+            prefixes.extend(folders)
 
         return None
 
     def find_files(self, prefix: str, delimiter: str = "/") -> list:
         """
-        find files in s3 bucket(recursive)
+        find files in s3 bucket(recursive, listed in one flat pass using list_files)
 
         Args:
             prefix (str): file path prefix
-            delimiter (str): file path delimiter (default: '/')
+            delimiter (str): not used, files in every sub directory are listed (default: '/')
 
         Returns:
             list: list of file path
@@ -746,8 +1137,22 @@ class s3namic:
             >>> s3 = 
             >>> s3.find_files(folder_path='assets/csv/')
         """
-        tree = self.make_tree(prefix, delimiter, with_file_name=True)
-        return [file for file in tree if tree[file] is None]
+        return self.list_files(prefix=prefix, delimiter="")
+
+    def _check_extension(self, extension: str):
+        """
+        Check that read_auto can read files of the extension
+
+        Args:
+            extension (str): file extension
+
+        Raises:
+            ValueError: if the extension is not one of READ_METHODS
+        """
+        if extension not in READ_METHODS:
+            raise ValueError(
+                f"This extension({extension}) is not supported. Please enter one of ({', '.join(READ_METHODS)})."
+            )
 
     def read_auto(
         self, file_name: str, extension: str = None, encoding: str = "utf-8", **kwargs
@@ -759,23 +1164,22 @@ class s3namic:
             file_name (str): file name
             extension (str): file extension (default: None)
             encoding (str): file encoding (default: 'utf-8')
-            **kwargs: arguments for read_csv, read_json, read_txt, read_pkl, read_parquet
+            **kwargs: arguments for read_csv, read_json, read_txt, read_pkl, read_parquet (including body)
 
         Returns:
             object: file content
 
+        Raises:
+            ValueError: if the extension is not one of READ_METHODS
+
         Example:
             >>> s3 = s3namic(bucket, access_key, secret_key, region)
             >>> s3.read_auto(file_name='test.txt', encoding='utf-8')
         """
         extension = self.extension(file_name) if extension is None else extension
-        raise_error = lambda msg: raise_error(msg, "aws_s3.read_auto")
-        return (
-            getattr(self, f"read_{extension}")(
-                file_name=file_name, encoding=encoding, **kwargs
-            )
-            if extension in ["csv", "json", "txt", "sql", "pkl", "parquet"]
-            else raise_error(f"This extension is not supported. Please enter one of ({extension}).")
+        self._check_extension(extension)
+        return getattr(self, READ_METHODS[extension])(
+            file_name=file_name, encoding=encoding, **kwargs
         )
 
     def read_thread(
@@ -784,23 +1188,30 @@ class s3namic:
         delimiter: str = "/",
         extension=None,
         str_contains: str = None,
-        workers: int = 4,
+        workers: int = None,
         encoding: str = "utf-8",
+        concurrency: int = DEFAULT_CONCURRENCY,
         **kwargs,
     ) -> object:
         """
         A function that reads all files in a folder and merges them into one file (using _thread_map)
         Only files that can be concat can be used
+        Files whose extension is not supported by read_auto are skipped
+        The files are downloaded in batches of concurrency files, and each batch is parsed in threads before the next one is downloaded:
+            - with the AWS CRT S3 client if the instance was created with use_crt=True and awscrt is installed (using _fetch_crt)
+            - else with aioboto3 if it is installed (using _fetch_async)
+            - else each thread downloads its own file
+            - uncompressed parquet files are not downloaded in batches, read_parquet reads only the byte ranges it needs
 
         Args:
             prefix (str): file path (default: '')
             delimiter (str): File path delimiter (default: '/')
             extension (str): File extension (default: None)
             str_contains (str): read only files that match part of the filename (default: None)
-            workers (int): number of threads (default: 4)
-                - If the workers parameter is not used, set the number of threads to 4
-                - It is recommended to set the thread count automatically using os.cpu_count()
+            workers (int): number of threads (default: None)
+                - If the workers parameter is not used, the thread pool of the instance is reused (see _thread_map)
             encoding (str): encoding (default: 'utf-8')
+            concurrency (int): number of files downloaded per batch with the CRT client or aioboto3 (default: min(64, os.cpu_count() * 8))
             **kwargs: arguments for Read_csv, read_json, read_txt, read_pickle, read_parquet
 
         Returns:
@@ -813,10 +1224,43 @@ class s3namic:
         files = self.find_files(prefix, delimiter)
         if str_contains is not None:
             files = [file for file in files if str_contains in file]
-        return self._thread_map(
-            func=lambda x: self.read_auto(
-                x, extension=extension, encoding=encoding, **kwargs
-            ),
-            iterable=files,
-            max_workers=workers,
+        if extension is not None:
+            self._check_extension(extension)
+        else:
+            files = [file for file in files if self.extension(file) in READ_METHODS]
+
+        read = lambda file, body=None: self.read_auto(
+            file, extension=extension, encoding=encoding, body=body, **kwargs
         )
+        # an event loop cannot be run inside a running one (e.g. in jupyter)
+        if not (self.__use_crt or (aioboto3 is not None and not _event_loop_running())):
+            return self._thread_map(func=read, iterable=files, max_workers=workers)
+
+        batches = [
+            files[start : start + concurrency] for start in range(0, len(files), concurrency)
+        ]
+        # uncompressed parquet files are left to read_parquet, which downloads only the selected columns and row groups
+        fetched = self._fetch_batches(
+            [
+                [
+                    file
+                    for file in batch
+                    if _compression(file) or (extension or self.extension(file)) != "parquet"
+                ]
+                for batch in batches
+            ],
+            concurrency,
+        )
+        result = []
+        try:
+            for batch, bodies in zip(batches, fetched):
+                result.extend(
+                    self._thread_map(
+                        func=lambda file: read(file, bodies.get(file)),
+                        iterable=batch,
+                        max_workers=workers,
+                    )
+                )
+        finally:
+            fetched.close()
+        return result
@@ -17,6 +17,13 @@ _hard_dependencies=[
     'pyarrow',
 ]
 
+_soft_dependencies=[
+    'aioboto3',
+    'isal',
+    'awscrt',
+    'orjson',
+]
+
 setup(
     name='s3namic',
     version=__version__,
@@ -29,7 +36,8 @@ setup(
     author_email='hyoj0942@gmail.com',
     url='https://github.com/hyoj0942/s3namic',
     install_requires=_hard_dependencies,
+    extras_require={'fast': _soft_dependencies},
     keywords=['aws', 's3', 'bucket', 'management'],
 )
 
-del _hard_dependencies
\ No newline at end of file
+del _hard_dependencies, _soft_dependencies
\ No newline at end of file